@@ -4,8 +4,11 @@ if [ -z "$TELEPRESENCE_TESTS" ]; then
     # Don't want parallism for OpenShift (causes problems with OpenShift
     # Online's limited free plan) and don't want parallelism for VPN-y method
     # since should only have one running a time, and parallelism breaks container
-    # method on OS X.
-    [ -z "$TELEPRESENCE_OPENSHIFT" ] && [ "$TELEPRESENCE_METHOD" == "inject-tcp" ] && export TELEPRESENCE_TESTS="-n 4";
+    # method on OS X.  Scheduling by scope keeps each Probe's tests on a single
+    # worker so they can share it.  That scheduling comes from a hook in
+    # tests/cluster/conftest.py, which pytest only loads early enough if
+    # tests/cluster is named on the command line below.
+    [ -z "$TELEPRESENCE_OPENSHIFT" ] && [ "$TELEPRESENCE_METHOD" == "inject-tcp" ] && export TELEPRESENCE_TESTS="-n 4 --dist=loadscope";
 fi
 env PATH="$PWD/cli/:$PATH" virtualenv/bin/py.test -v \
-    --timeout 360 --timeout-method thread --fulltrace $TELEPRESENCE_TESTS tests k8s-proxy/test_socks.py
+    --timeout 360 --timeout-method thread --fulltrace $TELEPRESENCE_TESTS tests/local tests/cluster k8s-proxy/test_socks.py
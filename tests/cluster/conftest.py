@@ -2,6 +2,9 @@
 Configure pytest for the Telepresence end-to-end test suite.
 """
 
+from functools import (
+    lru_cache,
+)
 from itertools import (
     product,
 )
@@ -12,15 +15,41 @@ from .parameterize_utils import (
     METHODS,
     OPERATIONS,
     Probe,
+    create_probe_namespace,
+)
+from .utils import (
+    cleanup_namespace,
+    start_kubectl_proxy,
+    stop_kubectl_proxy,
 )
 
 
+# Most of the kubectl commands the tests run are quick API requests.  Send them
+# through one long-running ``kubectl proxy`` so they don't each have to load
+# the kubeconfig and authenticate to the cluster.
+@pytest.fixture(scope="session", autouse=True)
+def kubectl_proxy():
+    proxy = start_kubectl_proxy()
+    yield proxy
+    stop_kubectl_proxy(proxy)
+
+
+# Kubernetes resources which don't depend on the method or operation being
+# tested are expensive to create so share them between all Probes.  Probes
+# request this fixture themselves when they launch.
+@pytest.fixture(scope="session")
+def probe_webserver():
+    webserver_ident = create_probe_namespace()
+    yield webserver_ident
+    cleanup_namespace(webserver_ident.namespace)
+
+
 # Mark this as the `probe` fixture and declare that instances of it may be
 # shared by any tests within the same module.
 @pytest.fixture(scope="module")
 def probe(request):
     method, operation = request.param
-    reason = method.unsupported()
+    reason = _method_unsupported(method)
     if reason is None:
         probe = Probe(request, method, operation)
         yield probe
@@ -43,6 +72,78 @@ def _get_marks(items):
     return [_make_mark(item.name) for item in items]
 
 
+def _probe_id(method, operation):
+    """
+    Get a readable name for the given method and operation.
+    """
+    return "{},{}".format(method.name, operation.name)
+
+
+def _xdist_scope(method, operation):
+    """
+    Get the pytest-xdist scheduling scope for the given method and operation.
+
+    With ``--dist=loadscope``, tests in the same scope always run on the same
+    worker.  Keeping every test for one set of parameters together means they
+    can share a single Probe.  vpn-tcp changes the host's network
+    configuration so only one such Telepresence session may run at a time;
+    all of its tests go in one scope so they run one after another.  Other
+    methods' Probes are free to run in parallel.
+    """
+    if method.name == "vpn-tcp":
+        return method.name
+    return _probe_id(method, operation)
+
+
+# The parameters are the elements of the cartesian product of methods,
+# operations.  Use the ``name`` of methods and operations to generate readable
+# parameterized test names.  Build these once no matter how many times
+# ``_probe_parametrize`` is used.
+_PROBE_PARAMS = [
+    pytest.param(
+        (method, operation),
+        marks=_get_marks((method, operation)),
+        id=_probe_id(method, operation),
+    ) for (method, operation) in product(METHODS, OPERATIONS)
+]
+
+# Map the id of each probe parameter to its pytest-xdist scheduling scope.
+_XDIST_SCOPES = {
+    _probe_id(method, operation): _xdist_scope(method, operation)
+    for (method, operation) in product(METHODS, OPERATIONS)
+}
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """
+    Make ``--dist=loadscope`` schedule tests by probe parameters (see
+    ``_xdist_scope``) rather than by module.
+
+    Other ``--dist`` modes are left alone.
+
+    pytest-xdist asks for a scheduler before collection, so this hook is only
+    used if this conftest is loaded at startup, ie when ``tests/cluster`` (or
+    something inside it) is named on the command line.
+    """
+    if config.getoption("dist") != "loadscope":
+        return None
+
+    # Only import this when pytest-xdist is actually in use.
+    from xdist.scheduler import LoadScopeScheduling
+
+    class ProbeScopeScheduling(LoadScopeScheduling):
+        def _split_scope(self, nodeid):
+            # Parametrized test node ids end with "[<param id>]".
+            param_id = nodeid.rpartition("[")[2].rstrip("]")
+            try:
+                return _XDIST_SCOPES[param_id]
+            except KeyError:
+                return super(ProbeScopeScheduling, self)._split_scope(nodeid)
+
+    return ProbeScopeScheduling(config, log)
+
+
 def _probe_parametrize(fixture_name):
     """
     Create a "parametrized" pytest fixture which will supply Probes (one for
@@ -53,16 +154,9 @@ def _probe_parametrize(fixture_name):
         # Parameterize the probe parameter to decorated methods
         fixture_name,
 
-        # The parameters are the elements of the cartesian product of methods,
-        # operations.
-        [
-            pytest.param(value, marks=_get_marks(value))
-            for value in product(METHODS, OPERATIONS)
-        ],
-
-        # Use the `name` of methods and operations to generate readable
-        # parameterized test names.
-        ids=lambda param: "{},{}".format(param[0].name, param[1].name),
+        # The parameters, complete with marks and ids, are shared by every
+        # use.
+        _PROBE_PARAMS,
 
         # Pass the parameters through the probe fixture to get the object
         # that's really passed to the decorated function.
@@ -70,11 +164,18 @@ def _probe_parametrize(fixture_name):
     )
 
 
+@lru_cache(maxsize=None)
+def _method_unsupported(method):
+    """
+    Determine whether a method can be used here, only checking once for each
+    method no matter how many operations or modules it is used with.
+    """
+    return method.unsupported()
+
+
 # Create a fixture supplying a Probe.
 with_probe = _probe_parametrize("probe")
 
-_after_probe_mark = pytest.mark.after_probe()
-
 
 def after_probe(f):
     """
@@ -87,75 +188,12 @@ def after_probe(f):
     will run against that same configuration.  This allows
     ``after_probe``-decorated tests to make assertions about the state of the
     system after Telepresence exits.
-    """
-    return with_probe(_after_probe_mark(f))
-
-
-def pytest_collection_modifyitems(session, config, items):
-    """
-    Re-arrange the test items so that ``after_probe`` tests run immediately
-    after ``with_probe`` tests that share the same parameters.
-
-    This provides the desired semantics of the ``after_probe`` fixture - that
-    such tests always run after any tests that use ``with_probe`` (with
-    corresponding parameters).
 
-    Additionally, we take care to make sure the ``after_probe`` tests appear
-    *immediately* after the corresponding ``with_probe`` tests.  This is
-    necessary so that ``after_probe`` tests can share the same probe as the
-    corresponding ``with_probe`` tests.  If unrelated tests are allowed to
-    intervene, the probe fixture may be cleaned up and then a new one
-    allocated for the ``after_probe`` tests.
+    This relies on pytest's own ordering rather than any hook of ours.  The
+    ``probe`` fixture is module-scoped and parametrized so pytest groups the
+    tests of a module by probe parameters to share one ``Probe`` per group.
+    Within a group tests keep the order in which they are defined.  So
+    ``after_probe`` tests must be defined after all of the ``with_probe``
+    tests in their module.
     """
-    # Find all the tests that need to run after the probe is done.
-    marked_items = [item for item in items if _is_after_probe_item(item)]
-
-    # Remove them from the original collection list.
-    items[:] = [item for item in items if item not in marked_items]
-    # Put them back immediately after the other tests that use a probe with the
-    # same params.
-    for inserting in marked_items:
-        found = False
-        for i, existing in enumerate(items):
-            try:
-                callspec = existing.callspec
-            except AttributeError:
-                # Not all Functions have a callspec.  Any that doesn't isn't
-                # parametrized like we are.  If we were previously within the
-                # block of like-configured tests, we're not anymore.
-                if found:
-                    items.insert(i, inserting)
-                    break
-
-                # None of the rest of the logic of this loop makes sense for
-                # non-parameterized tests.
-                continue
-
-            if callspec.params == inserting.callspec.params:
-                # We're somewhere in the block of like-configured tests.  We
-                # assume they all appear together.
-                found = True
-            elif found:
-                # We just went past the end of the group of like-param tests.
-                # Insert the test right here, pushing differently configured
-                # stuff back.
-                items.insert(i, inserting)
-                break
-        else:
-            if found:
-                # If we found the tests but we didn't insert it yet, this
-                # block must be at the end of the list of items.  So just
-                # append the subject test.
-                items.append(inserting)
-            else:
-                # If we _didn't_ find the tests then something is weird.
-                raise Exception(
-                    "Could not find correct position for {}".format(inserting)
-                )
-
-
-def _is_after_probe_item(item):
-    """
-    Determine if a test item (Function) was marked with ``after_probe``.
-    """
-    return item.get_closest_marker("after_probe") is not None
+    return with_probe(f)
@@ -1,22 +1,19 @@
 import os
-from functools import partial
-from json import JSONDecodeError, dumps, loads
+from functools import lru_cache, partial
+from json import JSONDecodeError, loads
 from pathlib import Path
 from random import randrange, shuffle
 from shutil import which
 from socket import AF_INET, SOCK_STREAM, getaddrinfo, gethostbyaddr
 from struct import unpack
-from subprocess import (
-    PIPE, STDOUT, CalledProcessError, Popen, TimeoutExpired, check_call,
-    check_output
-)
+from subprocess import PIPE, STDOUT, CalledProcessError, Popen, TimeoutExpired
 from sys import executable, stdout
 from time import sleep
 
 from telepresence.utilities import find_free_port
 
 from .utils import (
-    DIRECTORY, KUBECTL, cleanup_namespace, create_namespace, random_name,
+    DIRECTORY, create_namespace, kubectl_create, kubectl_delete, random_name,
     run_webserver, telepresence_image_version
 )
 
@@ -26,6 +23,11 @@ ENVFILE_PATH = Path("/tmp")
 LOCAL_WEB_PORT = 12399
 LOCAL_WEB_CONTAINER_PORT = 8000
 
+# The probe program to run in the Telepresence execution context, and the
+# Telepresence CLI to run it with.  These don't change from run to run.
+_PROBE_ENDTOEND = (DIRECTORY / "probe_endtoend.py").as_posix()
+_TELEPRESENCE_BIN = which("telepresence")
+
 
 def retry(condition, function):
     while True:
@@ -239,20 +241,24 @@ class _ExistingDeploymentOperation(object):
         else:
             ports = []
 
-        create_deployment(
-            deployment_ident,
-            self.image,
-            self.container_args,
-            environ,
-            ports,
-            replicas=self.replicas,
-        )
-
         self.json_env = ENVFILE_PATH / (deployment_ident.name + ".json")
         self.envfile = ENVFILE_PATH / (deployment_ident.name + ".env")
 
+        return [
+            deployment_object(
+                deployment_ident,
+                self.image,
+                self.container_args,
+                environ,
+                ports,
+                replicas=self.replicas,
+            )
+        ]
+
     def cleanup_deployment(self, deployment_ident):
-        _cleanup_deployment(deployment_ident)
+        return ["deployment/" + deployment_ident.name]
+
+    def cleanup_files(self):
         if self.json_env:
             self.json_env.unlink()
         if self.envfile:
@@ -267,10 +273,12 @@ class _ExistingDeploymentOperation(object):
         return []
 
     def prepare_service(self, deployment_ident, ports):
-        create_service(deployment_ident, ports)
+        if not ports:
+            return []
+        return [service_object(deployment_ident, ports)]
 
     def cleanup_service(self, deployment_ident):
-        cleanup_service(deployment_ident)
+        return ["service/" + deployment_ident.name]
 
     def telepresence_args(self, deployment_ident):
         if self.swap:
@@ -296,19 +304,28 @@ class _NewDeploymentOperation(object):
         return False
 
     def prepare_deployment(self, deployment_ident, environ):
-        pass
+        return []
 
     def cleanup_deployment(self, deployment_ident):
+        # Telepresence creates these.  Delete them ourselves in case it didn't
+        # (for example, because its session was deliberately broken) so they
+        # don't linger in the shared Namespace.
+        return [
+            "deployment/" + deployment_ident.name,
+            "service/" + deployment_ident.name,
+        ]
+
+    def cleanup_files(self):
         pass
 
     def auto_http_servers(self):
         return []
 
     def prepare_service(self, deployment_ident, ports):
-        pass
+        return []
 
     def cleanup_service(self, deployment_ident):
-        pass
+        return []
 
     def telepresence_args(self, deployment_ident):
         return [
@@ -319,9 +336,29 @@ class _NewDeploymentOperation(object):
         ]
 
 
-def create_deployment(deployment_ident, image, args, environ, ports, replicas):
+# The parts of the Deployment pod template which never vary.  These are shared
+# by every Deployment description so they must not be modified.
+_PODINFO_VOLUMES = [{
+    "name": "podinfo",
+    "downwardAPI": {
+        "items": [{
+            "path": "labels",
+            "fieldRef": {
+                "fieldPath": "metadata.labels"
+            },
+        }],
+    },
+}]
+_PODINFO_VOLUME_MOUNTS = [{
+    "name": "podinfo",
+    "mountPath": "/podinfo",
+}]
+_SECURITY_CONTEXT = {"readOnlyRootFilesystem": True}
+
+
+def deployment_object(deployment_ident, image, args, environ, ports, replicas):
     """
-    Create a ``Deployment`` in the current context.
+    Describe a ``Deployment``.
 
     :param ResourceIdent deployment_ident: The identifier to assign to the
         deployment.
@@ -338,29 +375,24 @@ def create_deployment(deployment_ident, image, args, environ, ports, replicas):
     :param int replicas: The number of replicas to configure for the
         Deployment.
 
-    :raise CalledProcessError: If the *kubectl* command returns an error code.
+    :return dict: The Deployment, ready to pass to ``kubectl_create``.
     """
     container = {
         "name": "hello",
         "image": image,
-        "env": list({
+        "env": [{
             "name": k,
             "value": v
-        } for (k, v) in environ.items()),
-        "volumeMounts": [{
-            "name": "podinfo",
-            "mountPath": "/podinfo",
-        }],
-        "securityContext": {
-            "readOnlyRootFilesystem": True
-        }
+        } for (k, v) in environ.items()],
+        "volumeMounts": _PODINFO_VOLUME_MOUNTS,
+        "securityContext": _SECURITY_CONTEXT,
     }
     if args is not None:
         container["args"] = args
     if ports is not None:
         container["ports"] = ports
 
-    deployment = dumps({
+    return {
         "kind": "Deployment",
         "apiVersion": "extensions/v1beta1",
         "metadata": {
@@ -378,29 +410,15 @@ def create_deployment(deployment_ident, image, args, environ, ports, replicas):
                     },
                 },
                 "spec": {
-                    "volumes": [{
-                        "name": "podinfo",
-                        "downwardAPI": {
-                            "items": [{
-                                "path": "labels",
-                                "fieldRef": {
-                                    "fieldPath": "metadata.labels"
-                                },
-                            }],
-                        },
-                    }],
+                    "volumes": _PODINFO_VOLUMES,
                     "containers": [container],
                 },
             },
         },
-    })
-    check_output([KUBECTL, "create", "-f", "-"],
-                 input=deployment.encode("utf-8"))
+    }
 
 
-def create_service(deployment_ident, ports):
-    if not ports:
-        return
+def service_object(deployment_ident, ports):
     service_obj = {
         "kind": "Service",
         "apiVersion": "v1",
@@ -423,15 +441,7 @@ def create_service(deployment_ident, ports):
             "port": port,
             "targetPort": port
         })
-    service = dumps(service_obj)
-    check_output([KUBECTL, "create", "-f", "-"], input=service.encode("utf-8"))
-
-
-def cleanup_service(deployment_ident):
-    check_call([
-        KUBECTL, "delete", "--namespace", deployment_ident.namespace,
-        "--ignore-not-found", "service", deployment_ident.name, "--wait=false"
-    ])
+    return service_obj
 
 
 INJECT_TCP_METHOD = _InjectTCPMethod()
@@ -458,17 +468,26 @@ class ResourceIdent(object):
         self.name = name
 
 
-def _cleanup_deployment(ident):
-    check_call([
-        KUBECTL,
-        "delete",
-        "--namespace",
-        ident.namespace,
-        "--ignore-not-found",
-        "deployment",
-        ident.name,
-        "--wait=false",
-    ])
+def create_probe_namespace():
+    """
+    Create a Kubernetes Namespace for Probes to run in.
+
+    It is important that the web server service in it exists before any
+    Deployment is created because the environment supplied by Kubernetes to a
+    Deployment's containers depends on the state of the cluster at the time
+    of pod creation.  Creating both once up front lets every Probe share them.
+
+    :return ResourceIdent: The web server service.  Cleaning up its Namespace
+        is the responsibility of the caller.
+    """
+    namespace = random_name("ns")
+    create_namespace(namespace, random_name("test"))
+
+    # This is an extra pod running on Kubernetes so that various tests can
+    # observe how such a thing impacts on the Telepresence execution
+    # environment (e.g., environment variables set, etc).
+    webserver_name = run_webserver(namespace)
+    return ResourceIdent(namespace=namespace, name=webserver_name)
 
 
 def _telepresence(telepresence_args, env=None):
@@ -486,7 +505,7 @@ def _telepresence(telepresence_args, env=None):
     """
     args = [
         executable,
-        which("telepresence"),
+        _TELEPRESENCE_BIN,
         "--logfile=-",
     ] + telepresence_args
 
@@ -507,6 +526,7 @@ def _telepresence(telepresence_args, env=None):
 
 def run_telepresence_probe(
     request,
+    webserver_ident,
     method,
     operation,
     desired_environment,
@@ -521,6 +541,10 @@ def run_telepresence_probe(
     """
     :param request: The pytest mumble mumble whatever.
 
+    :param ResourceIdent webserver_ident: The web server service created by
+        ``create_probe_namespace``.  The Deployment is created in the same
+        Namespace.
+
     :param method: The definition of a Telepresence method to use for this
         run.
 
@@ -550,41 +574,17 @@ def run_telepresence_probe(
 
     :param int desired_exit_code: The probe's exit status.
     """
-    probe_endtoend = (Path(__file__).parent / "probe_endtoend.py").as_posix()
-
-    # Create a web server service.  We'll observe side-effects related to
-    # this, such as things set in our environment, and also interact with
-    # it directly to demonstrate behaviors related to networking.  It's
-    # important that we create this before the ``prepare_deployment`` step
-    # below because the environment supplied by Kubernetes to a
-    # Deployment's containers depends on the state of the cluster at the
-    # time of pod creation.
+    # Deployments get their own name but share the Namespace (and webserver)
+    # with every other Probe.
     deployment_ident = ResourceIdent(
-        namespace=random_name("ns"),
+        namespace=webserver_ident.namespace,
         name=random_name("test"),
     )
-    # Create the Kubernetes Namespace everything related to this run will live
-    # in.  Cleanup is the responsibility of the Probe we return.
-    create_namespace(deployment_ident.namespace, deployment_ident.name)
-
-    # TODO: Factor run_webserver into a fixture that Probe can manage so that
-    # run_telepresence_probe can just focus on running telepresence.
-
-    # This is an extra pod running on Kubernetes so that various tests can
-    # observe how such a thing impacts on the Telepresence execution
-    # environment (e.g., environment variables set, etc).
-    webserver_name = run_webserver(deployment_ident.namespace)
 
-    operation.prepare_deployment(
+    deployment_objects = operation.prepare_deployment(
         deployment_ident,
         desired_environment,
     )
-    print(
-        "Prepared deployment {}/{}".format(
-            deployment_ident.namespace,
-            deployment_ident.name,
-        )
-    )
 
     # Make sure we expose every port with an http server that the tests want
     # to talk to.
@@ -598,8 +598,20 @@ def run_telepresence_probe(
     service_ports.extend([http.remote_port for http in auto_http_servers])
 
     # Tell the operation to prepare a service exposing those ports.
-    print("Creating service with ports {}".format(service_ports))
-    operation.prepare_service(deployment_ident, service_ports)
+    service_objects = operation.prepare_service(
+        deployment_ident, service_ports
+    )
+
+    # Create everything with a single kubectl invocation.  The Deployment
+    # comes first, as it always has.
+    print(
+        "Creating deployment {}/{} with service ports {}".format(
+            deployment_ident.namespace,
+            deployment_ident.name,
+            service_ports,
+        )
+    )
+    kubectl_create(deployment_objects + service_objects)
 
     probe_args = []
     for url in probe_urls:
@@ -627,7 +639,7 @@ def run_telepresence_probe(
         ])
 
     operation_args = operation.telepresence_args(deployment_ident)
-    method_args = method.telepresence_args(probe_endtoend)
+    method_args = method.telepresence_args(_PROBE_ENDTOEND)
     args = operation_args + telepresence_args + method_args + probe_args
     try:
         telepresence = _telepresence(args, client_environment)
@@ -655,7 +667,7 @@ def run_telepresence_probe(
             writer,
             telepresence,
             deployment_ident,
-            webserver_name,
+            webserver_ident.name,
             initial_result,
         )
 
@@ -678,7 +690,9 @@ def _read_tagged_output(process, output, writer):
     Telepresence/probe process.  Write any unstructured data found on the way
     to ``writer``.
     """
-    data = b""
+    # Accumulate output in place rather than building a new bytes object for
+    # every read.
+    data = bytearray()
     length = None
     while True:
         returncode = process.poll()
@@ -703,12 +717,12 @@ def _read_tagged_output(process, output, writer):
             # search so we can send all of data onwards right now.
             if MAGIC_PREFIX[0] not in data:
                 writer.write(data)
-                data = b""
+                data = bytearray()
         else:
             # Found the tag.  We can send anything before it onwards.
             if tag > 0:
                 writer.write(data[:tag])
-                data = data[tag:]
+                del data[:tag]
 
             if len(data) >= 8:
                 # There's enough data left that the 4 byte length prefix is
@@ -718,7 +732,7 @@ def _read_tagged_output(process, output, writer):
                 if len(data) >= length + 8:
                     # There's enough data to satisfy the length prefix.  We
                     # found the tagged output.  Grab it.
-                    tagged = data[8:length + 8]
+                    tagged = bytes(data[8:length + 8])
                     remaining = data[length + 8:]
 
                     # Strange buffering interactions in the way the probe
@@ -735,7 +749,7 @@ def _read_tagged_output(process, output, writer):
         if returncode is not None:
             if data:
                 writer.write(data)
-                data = b""
+                data = bytearray()
             break
     raise NoTaggedValue()
 
@@ -781,6 +795,61 @@ class AlsoProxy(object):
         self.host = host
 
 
+@lru_cache()
+def _also_proxy_targets():
+    """
+    Get the ``--also-proxy`` cases to exercise.
+
+    This involves DNS lookups so it is done the first time a ``Probe`` is
+    created rather than when this module is imported (ie, during test
+    collection).
+
+    :return tuple[AlsoProxy]: Cases for a hostname, an IP address literal, and
+        an IP network, in that order.
+    """
+    # Get some httpbin.org addresses.  We avoid the real domain name in the
+    # related tests due to
+    # <https://github.com/datawire/telepresence/issues/379>.
+    httpbin = iter(getaddrinfo(
+        "httpbin.org",
+        80,
+        AF_INET,
+        SOCK_STREAM,
+    ) * 2)
+
+    #
+    # Also notice that each case uses non-overlapping addresses because we run
+    # Telepresence once with _all_ of these as ``--also-proxy`` arguments.  We
+    # want to make sure each case works so we don't want overlapping addresses
+    # where an argument of form might work and cause it to appear as though
+    # the other cases are also working.  Instead, with a different address
+    # each time, each form must be working.
+    an_ip = next(httpbin)[4][0]
+    also_proxy_hostname = AlsoProxy(
+        # This is just any domain name that resolves to _one_ IP address that
+        # will serve up httpbin.org.  See #379.
+        gethostbyaddr(an_ip)[0],
+        an_ip,
+    )
+
+    # This time we're exercising Telepresence support for specifying an IP
+    # address literal to ``--also-proxy``.
+    an_ip = next(httpbin)[4][0]
+    also_proxy_ip = AlsoProxy(
+        an_ip,
+        an_ip,
+    )
+
+    # This time exercising support for specifying an IP network to
+    # ``--also-proxy``.
+    an_ip = next(httpbin)[4][0]
+    also_proxy_cidr = AlsoProxy(
+        "{}/32".format(an_ip),
+        an_ip,
+    )
+    return also_proxy_hostname, also_proxy_ip, also_proxy_cidr
+
+
 _json_blob = """{
     "a": "b",
     "c": "d",
@@ -826,49 +895,6 @@ class Probe(object):
         "var/run/secrets/kubernetes.io/serviceaccount/ca.crt",
     ]
 
-    # Get some httpbin.org addresses.  We avoid the real domain name in the
-    # related tests due to
-    # <https://github.com/datawire/telepresence/issues/379>.
-    _httpbin = iter(
-        getaddrinfo(
-            "httpbin.org",
-            80,
-            AF_INET,
-            SOCK_STREAM,
-        ) * 2
-    )
-
-    #
-    # Also notice that each ALSO_PROXY_... uses non-overlapping addresses
-    # because we run Telepresence once with _all_ of these as ``--also-proxy``
-    # arguments.  We want to make sure each case works so we don't want
-    # overlapping addresses where an argument of form might work and cause it
-    # to appear as though the other cases are also working.  Instead, with a
-    # different address each time, each form must be working.
-    _an_ip = next(_httpbin)[4][0]
-    ALSO_PROXY_HOSTNAME = AlsoProxy(
-        # This is just any domain name that resolves to _one_ IP address that
-        # will serve up httpbin.org.  See #379.
-        gethostbyaddr(_an_ip)[0],
-        _an_ip,
-    )
-
-    # This time we're exercising Telepresence support for specifying an IP
-    # address literal to ``--also-proxy``.
-    _an_ip = next(_httpbin)[4][0]
-    ALSO_PROXY_IP = AlsoProxy(
-        _an_ip,
-        _an_ip,
-    )
-
-    # This time exercising support for specifying an IP network to
-    # ``--also-proxy``.
-    _an_ip = next(_httpbin)[4][0]
-    ALSO_PROXY_CIDR = AlsoProxy(
-        "{}/32".format(_an_ip),
-        _an_ip,
-    )
-
     HTTP_SERVER_SAME_PORT = HTTPServer(
         random_port(),
         None,
@@ -906,6 +932,11 @@ class Probe(object):
         self.method = method
         self.operation = operation
         self._cleanup = []
+        (
+            self.ALSO_PROXY_HOSTNAME,
+            self.ALSO_PROXY_IP,
+            self.ALSO_PROXY_CIDR,
+        ) = _also_proxy_targets()
 
     def __str__(self):
         return "Probe[{}, {}]".format(
@@ -949,6 +980,7 @@ class Probe(object):
             self._result = "FAILED"
             self._result = run_telepresence_probe(
                 self._request,
+                self._request.getfixturevalue("probe_webserver"),
                 self.method,
                 self.operation,
                 self.DESIRED_ENVIRONMENT,
@@ -1002,9 +1034,15 @@ class Probe(object):
         if self._result is None:
             raise Exception("Probe never launched")
 
-        self.operation.cleanup_deployment(self._result.deployment_ident)
-        self.operation.cleanup_service(self._result.deployment_ident)
-        cleanup_namespace(self._result.deployment_ident.namespace)
+        ident = self._result.deployment_ident
+        kubectl_delete(
+            ident.namespace,
+            self.operation.cleanup_deployment(ident) +
+            self.operation.cleanup_service(ident),
+        )
+        # Only after the cluster resources are gone, so a problem with the
+        # files can't leave them behind.
+        self.operation.cleanup_files()
 
 
 def _cleanup_process(process):
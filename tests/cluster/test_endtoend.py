@@ -13,7 +13,7 @@ from urllib.request import urlopen
 import pytest
 
 from .conftest import after_probe, with_probe
-from .utils import DEPLOYMENT_TYPE, KUBECTL, query_from_cluster
+from .utils import DEPLOYMENT_TYPE, kubectl_command, query_from_cluster
 
 
 @pytest.fixture(scope="session")
@@ -473,6 +473,8 @@ def test_resolve_addresses_failure(probe):
     ), (success, reply)
 
 
+# Keep ``after_probe`` tests below every ``with_probe`` test in this module so
+# that they run after them.  See ``after_probe``.
 @after_probe
 def test_exit_code(probe):
     """
@@ -547,7 +549,14 @@ def test_swapdeployment_restores_deployment_pods(probe):
         "Didn't switch back: \n\t{}\n{}".format(
             image_and_phase,
             pformat(kubectl(
-                "get", "-o", "json", "all", "--selector", selector,
+                "get",
+                "--namespace",
+                result.deployment_ident.namespace,
+                "-o",
+                "json",
+                "all",
+                "--selector",
+                selector,
             )),
         )
 
@@ -567,7 +576,7 @@ def test_swapdeployment_restores_deployment_replicas(probe):
 
 
 def kubectl(*argv):
-    return loads(check_output((KUBECTL, ) + argv).decode("utf-8"))
+    return loads(check_output(kubectl_command() + list(argv)).decode("utf-8"))
 
 
 def get_deployment(ident):
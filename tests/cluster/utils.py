@@ -7,7 +7,9 @@ import time
 from base64 import b64encode
 from json import dumps
 from pathlib import Path
-from subprocess import CalledProcessError, check_call, check_output
+from subprocess import (
+    PIPE, CalledProcessError, Popen, check_call, check_output
+)
 
 DIRECTORY = Path(__file__).absolute().parent
 REVISION = str(check_output(["git", "rev-parse", "--short", "HEAD"]),
@@ -93,6 +95,66 @@ kind: Deployment""",
     )
     DEPLOYMENT_TYPE = "deployment"
 
+# Extra arguments for kubectl commands which can go through the session's
+# ``kubectl proxy``.  Empty when no proxy is running.
+_kubectl_proxy_args = []
+
+
+def start_kubectl_proxy():
+    """
+    Start a ``kubectl proxy`` and send ``kubectl_command`` commands through it.
+
+    The proxy loads the kubeconfig and authenticates to the cluster once.
+    Commands sent through it skip all of that and talk plain HTTP to a local
+    port.  The proxy can't handle streaming requests (``exec``, ``attach``,
+    ``run --attach``, ...) so those must keep using ``KUBECTL`` directly.
+
+    :return Popen: The proxy process.  Pass it to ``stop_kubectl_proxy`` when
+        done.
+    """
+    proxy = Popen([KUBECTL, "proxy", "--port=0"], stdout=PIPE)
+    # kubectl reports the port it picked like
+    # "Starting to serve on 127.0.0.1:45678".
+    line = proxy.stdout.readline().decode("utf-8").strip()
+    port = line.rpartition(":")[2]
+    if not port.isdigit():
+        proxy.terminate()
+        proxy.wait()
+        proxy.stdout.close()
+        raise RuntimeError("Could not start kubectl proxy: {!r}".format(line))
+    print("Started kubectl proxy on port {}".format(port))
+    # Ignore the kubeconfig entirely; the proxy takes care of credentials.
+    _kubectl_proxy_args[:] = [
+        "--kubeconfig=/dev/null",
+        "--server=http://127.0.0.1:{}".format(port),
+    ]
+    return proxy
+
+
+def stop_kubectl_proxy(proxy):
+    """
+    Stop a proxy started by ``start_kubectl_proxy``.  ``kubectl_command``
+    commands talk to the cluster directly again.
+    """
+    _kubectl_proxy_args[:] = []
+    proxy.terminate()
+    proxy.wait()
+    proxy.stdout.close()
+
+
+def kubectl_command():
+    """
+    Get the start of a kubectl command line which doesn't involve streaming.
+
+    Commands sent through the proxy don't load the kubeconfig so they don't
+    know the current context's namespace.  Commands for namespaced objects
+    must give ``--namespace`` (or name the namespace in the objects).
+
+    :return list[str]: The command line, using the ``kubectl proxy`` if one
+        is running.
+    """
+    return [KUBECTL] + _kubectl_proxy_args
+
 
 def random_name(suffix=""):
     """Return a new name each time."""
@@ -226,7 +288,10 @@ def query_from_cluster(url, namespace, tries=10, retries_on_empty=0):
         print("query output:")
         print(_indent(res))
         if delimiter in res:
-            before, res, after = res.split(delimiter + "\n")
+            # Keep only what is between the two delimiters without splitting
+            # up the rest of the output.
+            _, _, res = res.partition(delimiter + "\n")
+            res, _, _ = res.partition(delimiter + "\n")
             return res
         print("... empty response (no delimiter)")
     return res
@@ -241,15 +306,14 @@ def run_webserver(namespace=None):
     webserver_name = random_name("web")
     if namespace is None:
         namespace = current_namespace()
-    kubectl = [KUBECTL, "--namespace", namespace]
+    kubectl = kubectl_command() + ["--namespace", namespace]
 
     def cleanup():
-        check_call(
-            kubectl + [
-                "delete", "--ignore-not-found", "all", "--wait=false",
-                "--selector=telepresence=" + webserver_name
-            ]
-        )
+        # This may run at exit, after the kubectl proxy has stopped.
+        check_call([
+            KUBECTL, "--namespace", namespace, "delete", "--ignore-not-found",
+            "all", "--wait=false", "--selector=telepresence=" + webserver_name
+        ])
 
     cleanup()
     atexit.register(cleanup)
@@ -300,8 +364,30 @@ def current_namespace():
     ) or "default"
 
 
-def create_namespace(namespace_name, name):
-    namespace = dumps({
+def kubectl_create(objects):
+    """
+    Create some Kubernetes objects with a single *kubectl* invocation.
+
+    :param list[dict] objects: The objects to create.  They are created in
+        the given order.  Nothing is done if this is empty.
+
+    :raise CalledProcessError: If the *kubectl* command returns an error code.
+    """
+    if not objects:
+        return
+    object_list = dumps({
+        "kind": "List",
+        "apiVersion": "v1",
+        "items": objects,
+    })
+    check_output(
+        kubectl_command() + ["create", "-f", "-"],
+        input=object_list.encode("utf-8")
+    )
+
+
+def namespace_object(namespace_name, name):
+    return {
         "kind": "Namespace",
         "apiVersion": "v1",
         "metadata": {
@@ -310,12 +396,37 @@ def create_namespace(namespace_name, name):
                 "telepresence-test": name,
             },
         },
-    })
-    check_output([KUBECTL, "create", "-f", "-"],
-                 input=namespace.encode("utf-8"))
+    }
+
+
+def create_namespace(namespace_name, name):
+    kubectl_create([namespace_object(namespace_name, name)])
+
+
+def kubectl_delete(namespace, resources):
+    """
+    Delete some Kubernetes objects with a single *kubectl* invocation.
+
+    :param str namespace: The Namespace the objects are in.
+
+    :param list[str] resources: The objects to delete, as ``kind/name``.
+        Objects which don't exist are ignored.  Nothing is done if this is
+        empty.
+
+    :raise CalledProcessError: If the *kubectl* command returns an error code.
+    """
+    if not resources:
+        return
+    check_call(
+        kubectl_command() + [
+            "delete", "--namespace", namespace, "--ignore-not-found",
+            "--wait=false"
+        ] + resources
+    )
 
 
 def cleanup_namespace(namespace_name):
-    check_call([
-        KUBECTL, "delete", "namespace", namespace_name, "--wait=false"
-    ])
+    check_call(
+        kubectl_command() +
+        ["delete", "namespace", namespace_name, "--wait=false"]
+    )